@@ -1,5 +1,5 @@
 import random
-import operator
+import re
 
 from . import storage
 from .core import command
@@ -118,31 +118,34 @@ class SQLiteQuotes(Quotes, storage.SQLiteStorage):
 class MongoDBQuotes(Quotes, storage.MongoDBStorage):
     collection_name = 'quotes'
 
-    def find_matches(self, thing):
-        thing = thing.strip().lower()
-        words = thing.split()
-
-        def matches(quote):
-            quote = quote.lower()
-            return all(word in quote for word in words)
+    def _match_query(self, thing):
+        """
+        Query for quotes containing each word in thing (case-insensitive).
+        """
+        words = thing.strip().split()
+        query = dict(library=self.lib)
+        if words:
+            query['$and'] = [
+                {'text': {'$regex': re.escape(word), '$options': 'i'}}
+                for word in words
+            ]
+        return query
 
-        return [
-            row
-            for row in self.db.find(dict(library=self.lib)).sort('_id')
-            if matches(row['text'])
-        ]
+    def find_matches(self, thing):
+        # only the text is needed to match (and _id to delete)
+        rows = self.db.find(self._match_query(thing), {'text': 1}).sort('_id')
+        return list(rows)
 
     def lookup_with_num(self, thing='', num=0):
-        by_text = operator.itemgetter('text')
-        results = list(map(by_text, self.find_matches(thing)))
-
-        n = len(results)
+        query = self._match_query(thing)
+        n = self.db.count_documents(query)
         if n > 0:
             if num:
                 i = num - 1
             else:
                 i = random.randrange(n)
-            quote = results[i]
+            cursor = self.db.find(query, {'text': 1}).sort('_id').skip(i).limit(1)
+            quote = next((row['text'] for row in cursor), '')
         else:
             i = 0
             quote = ''
@@ -181,7 +184,7 @@ class MongoDBQuotes(Quotes, storage.MongoDBStorage):
             log_db = self.db.database.logs
             logging.Logger.log_id_map = {
                 logging.MongoDBLogger.extract_legacy_id(rec['_id']): rec['_id']
-                for rec in log_db.find(projection=[])
+                for rec in log_db.find({}, projection={'_id': 1})
             }
         return logging.Logger.log_id_map
 
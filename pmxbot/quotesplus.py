@@ -1,12 +1,12 @@
+import contextlib
 import random
-import operator
+import re
 
 from . import storage
 from .core import command
-from . import quotes
 
 
-class QuotesPlus(quotes.Quotes):
+class QuotesPlus(storage.SelectableStorage):
     """
     A version of Quotes module that allows quotes to be referenced using "library" keys.
     For instance, quotes can be stored as "albums" or "bands" and can be looked up later.
@@ -33,6 +33,45 @@ class QuotesPlus(quotes.Quotes):
         return self.lookup_with_num(lib, *self.split_num(rest))
 
 
+_COUNT_ALL_SQL = """
+    SELECT count(*)
+    FROM quotes
+    WHERE library = ?
+    """
+_PICK_ALL_SQL = """
+    SELECT quoteid, quote
+    FROM quotes
+    WHERE library = ? order by quoteid
+    LIMIT 1 OFFSET ?
+    """
+_COUNT_MATCH_SQL = """
+    SELECT count(*)
+    FROM quotes
+    WHERE library = ? AND quoteid IN (
+        SELECT rowid FROM quotes_fts WHERE quotes_fts MATCH ?
+    )
+    """
+_PICK_MATCH_SQL = """
+    SELECT quoteid, quote
+    FROM quotes
+    WHERE library = ? AND quoteid IN (
+        SELECT rowid FROM quotes_fts WHERE quotes_fts MATCH ?
+    ) order by quoteid
+    LIMIT 1 OFFSET ?
+    """
+_COUNT_LIKE_SQL = """
+    SELECT count(*)
+    FROM quotes
+    WHERE library = ? AND quote LIKE ? ESCAPE '\\'
+    """
+_PICK_LIKE_SQL = """
+    SELECT quoteid, quote
+    FROM quotes
+    WHERE library = ? AND quote LIKE ? ESCAPE '\\' order by quoteid
+    LIMIT 1 OFFSET ?
+    """
+
+
 class SQLiteQuotesPlus(QuotesPlus, storage.SQLiteStorage):
     """
     SQLite implentation of QuotesPlus
@@ -58,36 +97,153 @@ class SQLiteQuotesPlus(QuotesPlus, storage.SQLiteStorage):
         self.db.execute(CREATE_QUOTES_TABLE)
         self.db.execute(CREATE_QUOTES_INDEX)
         self.db.execute(CREATE_QUOTE_LOG_TABLE)
+        self.init_fts()
         self.db.commit()
 
-    def lookup_with_num(self, lib, thing='', num=0):
-        BASE_SEARCH_SQL = """
-            SELECT quoteid, quote
-            FROM quotes
-            WHERE library = ? %s order by quoteid
+    def init_fts(self):
+        """
+        Maintain a full-text index over the quotes, kept in sync
+        with the quotes table by triggers.
+        """
+        CREATE_QUOTES_FTS_TABLE = """
+            CREATE VIRTUAL TABLE
+            IF NOT EXISTS quotes_fts
+            USING fts5(
+                quote,
+                content='quotes',
+                content_rowid='quoteid',
+                tokenize='unicode61 remove_diacritics 2'
+            )
             """
-        thing = thing.strip().lower()
+        CREATE_QUOTES_FTS_TRIGGERS = [
+            """
+            CREATE TRIGGER IF NOT EXISTS quotes_fts_insert
+            AFTER INSERT ON quotes BEGIN
+                INSERT INTO quotes_fts (rowid, quote) VALUES (new.quoteid, new.quote);
+            END
+            """,
+            """
+            CREATE TRIGGER IF NOT EXISTS quotes_fts_delete
+            AFTER DELETE ON quotes BEGIN
+                INSERT INTO quotes_fts (quotes_fts, rowid, quote)
+                VALUES ('delete', old.quoteid, old.quote);
+            END
+            """,
+            """
+            CREATE TRIGGER IF NOT EXISTS quotes_fts_update
+            AFTER UPDATE ON quotes BEGIN
+                INSERT INTO quotes_fts (quotes_fts, rowid, quote)
+                VALUES ('delete', old.quoteid, old.quote);
+                INSERT INTO quotes_fts (rowid, quote) VALUES (new.quoteid, new.quote);
+            END
+            """,
+        ]
+        BACKFILL_QUOTES_FTS = """
+            INSERT INTO quotes_fts (rowid, quote) SELECT quoteid, quote FROM quotes
+            """
+        exists = self.db.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'quotes_fts'"
+        ).fetchone()
+        self.db.execute(CREATE_QUOTES_FTS_TABLE)
+        for trigger in CREATE_QUOTES_FTS_TRIGGERS:
+            self.db.execute(trigger)
+        if not exists:
+            # index any quotes that predate the full-text table
+            self.db.execute(BACKFILL_QUOTES_FTS)
+
+    def lookup_with_num(self, lib, thing='', num=0):
         num = int(num)
-        if thing:
-            wtf = ' AND %s' % (
-                ' AND '.join(["quote like '%%%s%%'" % x for x in thing.split()])
-            )
-            SEARCH_SQL = BASE_SEARCH_SQL % wtf
-        else:
-            SEARCH_SQL = BASE_SEARCH_SQL % ''
-        results = [x[1] for x in self.db.execute(SEARCH_SQL, (lib,)).fetchall()]
-        n = len(results)
+        COUNT_SQL, PICK_SQL, params = self._search(lib, thing)
+        (n,) = self.db.execute(COUNT_SQL, params).fetchone()
         if n > 0:
             if num:
                 i = num - 1
             else:
                 i = random.randrange(n)
-            quote = results[i]
+            row = self.db.execute(PICK_SQL, params + (i,)).fetchone()
+            quote = row[1] if row else ''
         else:
             i = 0
             quote = ''
         return (quote, i + 1, n)
 
+    def delete(self, lib, lookup):
+        """
+        If exactly one quote matches, delete it. Otherwise,
+        raise a ValueError.
+        """
+        lookup, num = self.split_num(lookup)
+        COUNT_SQL, PICK_SQL, params = self._search(lib, lookup)
+        if num:
+            row = self.db.execute(PICK_SQL, params + (num - 1,)).fetchone()
+            if row is None:
+                raise IndexError(f"No match number {num}")
+        else:
+            (n,) = self.db.execute(COUNT_SQL, params).fetchone()
+            if n != 1:
+                raise ValueError(f"{n} quotes matched")
+            row = self.db.execute(PICK_SQL, params + (0,)).fetchone()
+        quoteid = row[0]
+        self.db.execute('DELETE FROM quote_log WHERE quoteid = ?', (quoteid,))
+        self.db.execute('DELETE FROM quotes WHERE quoteid = ?', (quoteid,))
+        self.db.commit()
+
+    def _search(self, lib, thing):
+        """
+        Return the (count, pick) statements and their parameters
+        for the quotes in lib matching thing.
+        """
+        thing = thing.strip().lower()
+        expression = self._match_expression(thing)
+        if expression:
+            COUNT_SQL, PICK_SQL = _COUNT_MATCH_SQL, _PICK_MATCH_SQL
+            params = lib, expression
+        elif thing:
+            # only punctuation, which the full-text index doesn't hold
+            COUNT_SQL, PICK_SQL = _COUNT_LIKE_SQL, _PICK_LIKE_SQL
+            params = lib, self._like_pattern(thing)
+        else:
+            COUNT_SQL, PICK_SQL = _COUNT_ALL_SQL, _PICK_ALL_SQL
+            params = (lib,)
+        return COUNT_SQL, PICK_SQL, params
+
+    @staticmethod
+    def _match_expression(thing):
+        """
+        Build an FTS5 query requiring a token starting with each word in
+        thing, so "warp" finds "Warps" (but "arp" does not). Each word is
+        passed as a quoted string so that user input cannot inject
+        FTS5 operators or syntax.
+
+        The index holds only letters and digits, so words made solely of
+        punctuation are dropped, and a word ending in punctuation must
+        match whole tokens ("c++" finds "C++" but not "café").
+
+        >>> SQLiteQuotesPlus._match_expression('a"b OR c')
+        '"a""b"* "OR"* "c"*'
+        >>> SQLiteQuotesPlus._match_expression('c++ :)')
+        '"c++"'
+        """
+        terms = []
+        for word in thing.split():
+            if not any(map(str.isalnum, word)):
+                continue
+            escaped = word.replace('"', '""')
+            prefix = '*' if word[-1].isalnum() else ''
+            terms.append(f'"{escaped}"{prefix}')
+        return ' '.join(terms)
+
+    @staticmethod
+    def _like_pattern(thing):
+        r"""
+        Build a LIKE pattern matching the words of thing in order.
+
+        >>> SQLiteQuotesPlus._like_pattern(':) 100%')
+        '%:)%100\\%%'
+        """
+        escaped = (re.sub(r'([\\%_])', r'\\\1', word) for word in thing.split())
+        return '%' + '%'.join(escaped) + '%'
+
     def add(self, lib, quote):
         quote = quote.strip()
         if not quote:
@@ -122,31 +278,56 @@ class SQLiteQuotesPlus(QuotesPlus, storage.SQLiteStorage):
 class MongoDBQuotes(QuotesPlus, storage.MongoDBStorage):
     collection_name = 'quotes'
 
-    def find_matches(self, lib, thing):
-        thing = thing.strip().lower()
-        words = thing.split()
+    def __init__(self, host_uri):
+        super().__init__(host_uri)
+        # the text index is required for $text searches; a collection
+        # allows only one, so keep any text index already on the
+        # (shared) quotes collection rather than fail to start
+        with contextlib.suppress(storage.pymongo.errors.OperationFailure):
+            self.db.create_index([('text', 'text')])
+        self.db.create_index('library')
 
-        def matches(quote):
-            quote = quote.lower()
-            return all(word in quote for word in words)
+    @staticmethod
+    def _match_query(lib, thing):
+        """
+        Query for quotes in lib containing each word in thing
+        (case-insensitive), using the text index.
 
-        return [
-            row
-            for row in self.db.find(dict(library=lib)).sort('_id')
-            if matches(row['text'])
-        ]
+        Unlike the SQLite backend, the text index matches whole (stemmed)
+        words only: "tim" does not find "time". It also ignores English
+        stop words, so a search for only "the" finds nothing.
 
-    def lookup_with_num(self, lib, thing='', num=0):
-        by_text = operator.itemgetter('text')
-        results = list(map(by_text, self.find_matches(lib, thing)))
+        >>> MongoDBQuotes._match_query('album', 'time  "warp"')
+        {'library': 'album', '$text': {'$search': '"time" "warp"'}}
+        """
+        # quote each word so the text search requires all of them
+        words = thing.replace('"', ' ').split()
+        query = dict(library=lib)
+        if words:
+            query['$text'] = {'$search': ' '.join(f'"{word}"' for word in words)}
+        return query
+
+    def find_matches(self, lib, thing):
+        query = self._match_query(lib, thing)
+        return list(self.db.find(query, {'text': 1}).sort('_id'))
 
-        n = len(results)
+    def lookup_with_num(self, lib, thing='', num=0):
+        query = self._match_query(lib, thing)
+        n = self.db.count_documents(query)
         if n > 0:
             if num:
                 i = num - 1
             else:
                 i = random.randrange(n)
-            quote = results[i]
+            pipeline = [
+                {'$match': query},
+                {'$sort': {'_id': 1}},
+                {'$skip': i},
+                {'$limit': 1},
+                {'$project': {'text': 1}},
+            ]
+            row = next(self.db.aggregate(pipeline), None)
+            quote = row['text'] if row else ''
         else:
             i = 0
             quote = ''
@@ -186,17 +367,31 @@ class MongoDBQuotes(QuotesPlus, storage.MongoDBStorage):
             log_db = self.db.database.logs
             logging.Logger.log_id_map = {
                 logging.MongoDBLogger.extract_legacy_id(rec['_id']): rec['_id']
-                for rec in log_db.find(projection=[])
+                for rec in log_db.find({}, projection={'_id': 1})
             }
         return logging.Logger.log_id_map
 
-    def import_(self, quote):
+    def _resolve_log_id(self, quote):
         log_id_map = self._build_log_id_map()
         log_id = quote.pop('log_id', None)
         log_id = log_id_map.get(log_id, log_id)
         if log_id is not None:
             quote['log_id'] = log_id
-        self.db.insert_one(quote)
+        return quote
+
+    def import_(self, quote):
+        self.db.insert_one(self._resolve_log_id(quote))
+
+    def bulk_import(self, quotes):
+        """
+        Import many quotes in a single round trip.
+        """
+        docs = list(map(self._resolve_log_id, quotes))
+        if docs:
+            self.db.insert_many(docs, ordered=False)
+
+
+_QUOTE_CMD_RE = re.compile(r'(?P<cmd>add|del):? (?P<body>.*)', re.DOTALL)
 
 
 def quote_command(lib, rest):
@@ -208,47 +403,58 @@ def quote_command(lib, rest):
     matching exactly one query.
     """
     rest = rest.strip()
-    if rest.startswith('add: ') or rest.startswith('add '):
-        quote_to_add = rest.split(' ', 1)[1]
-        QuotesPlus.store.add(lib, quote_to_add)
-        quot = False
-        return f'{lib} added!'
-    if rest.startswith('del: ') or rest.startswith('del '):
-        _, _, lookup = rest.partition(' ')
-        QuotesPlus.store.delete(lookup)
-        return f'Deleted the sole {lib} that matched'
-    quot, i, num = QuotesPlus.store.lookup(rest)
+    match = _QUOTE_CMD_RE.fullmatch(rest)
+    cmd, body = match.groups() if match else (None, rest)
+    handler = _quote_handlers.get(cmd, _lookup_quote)
+    return handler(lib, body)
+
+
+def _add_quote(lib, quote):
+    QuotesPlus.store.add(lib, quote)
+    return f'{lib} added!'
+
+
+def _delete_quote(lib, lookup):
+    QuotesPlus.store.delete(lib, lookup)
+    return f'Deleted the sole {lib} that matched'
+
+
+def _lookup_quote(lib, rest):
+    quot, i, num = QuotesPlus.store.lookup(lib, rest)
     if not quot:
         return
     return f'({i}/{num}): {quot}'
 
 
-@command
+_quote_handlers = {'add': _add_quote, 'del': _delete_quote}
+
+
+@command()
 def album(rest):
     """ !album commond """
     return quote_command('album', rest)
 
-@command
+@command()
 def band(rest):
     """ !band commond """
     return quote_command('band', rest)
 
-@command
+@command()
 def song(rest):
     """ !song commond """
     return quote_command('song', rest)
 
-@command
+@command()
 def robjob(rest):
     """ !robjob commond """
     return quote_command('robjob', rest)
 
-@command
+@command()
 def food(rest):
     """ !food commond """
     return quote_command('food', rest)
 
-@command
+@command()
 def tagline(rest):
     """ !tagline commond """
     return quote_command('tagline', rest)
@@ -87,7 +87,8 @@ Subcommands
     Otherwise, it must be a valid index and the topic is reordered to match.
     For example, with stack "1: a | 2: b | 3: c", the command
     `!stack shuffle [3, 1]` reorders the stack to "1: c | 2: a",
-    and the "b" item is dropped.
+    and the "b" item is dropped. An index that matches no items leaves
+    the topic unchanged.
 
 !stack topics [index]
     Return a list of topics, numbered in alphabetical order.
@@ -95,16 +96,13 @@ Subcommands
 
 import random
 import re
-import itertools
+import functools
 import os
 
 from . import storage
 from .core import command
 
 
-flatten = itertools.chain.from_iterable
-
-
 class Stack(storage.SelectableStorage):
     @classmethod
     def init(cls):
@@ -145,21 +143,13 @@ class SQLiteStack(Stack, storage.SQLiteStorage):
             return rows[0].split("\n")
 
     def save_items(self, topic, items):
-        items = "\n".join(items)
-        has_entry = self.db.execute(
-            "SELECT items FROM stack WHERE topic = ?", [topic]
-        ).fetchone()
-        if has_entry:
-            if items:
-                return self.db.execute(
-                    "UPDATE stack SET items = ? WHERE topic = ?", [items, topic]
-                )
-            else:
-                return self.db.execute("DELETE FROM stack WHERE topic = ?", [topic])
-        else:
-            return self.db.execute(
-                "INSERT INTO stack (topic, items) VALUES (?, ?)", [topic, items]
-            )
+        UPSERT_ITEMS_SQL = """
+            INSERT INTO stack (topic, items) VALUES (?, ?)
+            ON CONFLICT (topic) DO UPDATE SET items = excluded.items
+            """
+        if not items:
+            return self.db.execute("DELETE FROM stack WHERE topic = ?", [topic])
+        return self.db.execute(UPSERT_ITEMS_SQL, [topic, "\n".join(items)])
 
 
 class MongoDBStack(Stack, storage.MongoDBStorage):
@@ -211,8 +201,8 @@ helpdoc = dict(
 helpdoc['list'] = helpdoc['topics']
 
 
-def parse_index(index, items):
-    """Return a list of 0-based index numbers from a (1-based) `index` str.
+def parse_index(index, items, *, bounded=True):
+    """Return a list of unique 0-based index numbers from a (1-based) `index` str.
 
     * A single item index, like `[3]`. Negative indices count backward from
       the bottom; that is, the bottom-most item in a 3-item stack can be
@@ -232,20 +222,36 @@ def parse_index(index, items):
       matches both `[6]` and `["i"]`, but is only included once. However,
       if the stack had another "8: indigo" entry, it would have been included.
 
+    Indices outside of `items` are dropped unless `bounded` is False.
     """
     if index is None:
         index = ""
 
     atoms = filter(None, (atom.strip() for atom in index.split(",")))
-    return list(flatten(_parse_atom(atom, items) for atom in atoms))
+    indices = []
+    lowered = None
+    for atom in atoms:
+        if _is_quoted(atom):
+            # lowercase the items once, for all text atoms
+            if lowered is None:
+                lowered = [item.lower() for item in items]
+            indices.extend(_parse_atom_substring(atom[1:-1].lower(), lowered))
+        else:
+            indices.extend(_parse_atom(atom, items))
+    if bounded:
+        indices = filter(range(len(items)).__contains__, indices)
+    # de-duplicate, preserving order
+    return list(dict.fromkeys(indices))
 
 
-def _parse_atom(atom, items):
-    if (atom.startswith("'") and atom.endswith("'")) or (
+def _is_quoted(atom):
+    return (atom.startswith("'") and atom.endswith("'")) or (
         atom.startswith('"') and atom.endswith('"')
-    ):
-        yield from _parse_atom_substring(atom[1:-1].lower(), items)
-    elif atom.startswith('/') and atom.endswith('/'):
+    )
+
+
+def _parse_atom(atom, items):
+    if atom.startswith('/') and atom.endswith('/'):
         yield from _parse_atom_pattern(atom[1:-1], items)
     elif ":" in atom:
         yield from _parse_atom_range(atom, items)
@@ -261,22 +267,29 @@ def _parse_atom(atom, items):
         yield index - 1
 
 
-def _parse_atom_substring(substring, items):
-    return (index for index, item in enumerate(items) if substring in item.lower())
+def _parse_atom_substring(substring, lowered):
+    return (index for index, item in enumerate(lowered) if substring in item)
 
 
 def _parse_atom_pattern(pattern, items):
-    return (index for index, item in enumerate(items) if re.search(pattern, item))
+    rx = _compile(pattern)
+    return (index for index, item in enumerate(items) if rx.search(item))
+
+
+@functools.lru_cache(maxsize=512)
+def _compile(pattern):
+    return re.compile(pattern)
 
 
 def _parse_atom_range(range_str, items):
+    n = len(items)
     start, end = (x.strip() for x in range_str.split(":", 1))
     start = int(start) if start else 1
     if start < 0:
-        start += len(items) + 1
-    end = int(end) if end else len(items)
+        start += n + 1
+    end = int(end) if end else n
     if end < 0:
-        end += len(items) + 1
+        end += n + 1
     start -= 1  # Shift to Python 0-based indices
     end -= 1  # Shift to Python 0-based indices
     return range(start, end + 1)
@@ -305,7 +318,9 @@ def stack(nick, rest):
     items = _items_for_command(subcommand, topic)
 
     try:
-        indices = parse_index(index, items)
+        # add accepts indices past either end of the stack
+        bounded = subcommand != 'add'
+        indices = parse_index(index, items, bounded=bounded) if index else None
     except ValueError:
         return helpdoc["index"]
 
@@ -322,7 +337,7 @@ def _handle_add(new_item, indices, items, topic):
     if not indices:
         items.insert(0, new_item)
     else:
-        for i in reversed(sorted(set(indices))):
+        for i in sorted(indices, reverse=True):
             if i >= len(items):
                 items.append(new_item)
             else:
@@ -332,12 +347,10 @@ def _handle_add(new_item, indices, items, topic):
 
 
 def _handle_pop(new_item, indices, items, topic):
-    if not indices:
-        indices = [0]
+    if indices is None:
+        indices = [0] if items else []
 
-    popped_items = [
-        items.pop(i) for i in reversed(sorted(set(indices))) if len(items) > i >= 0
-    ]
+    popped_items = [items.pop(i) for i in sorted(indices, reverse=True)]
 
     Stack.store.save_items(topic, items)
 
@@ -350,17 +363,17 @@ def _handle_show(new_item, indices, items, topic):
     if new_item:
         return helpdoc["show"]
 
-    if not indices:
+    if indices is None:
         indices = range(len(items))
 
-    return output([(i + 1, items[i]) for i in indices if len(items) > i >= 0])
+    return output([(i + 1, items[i]) for i in indices])
 
 
 def _handle_shuffle(new_item, indices, items, topic):
-    if not indices:
+    if indices is None:
         random.shuffle(items)
-    else:
-        items = [items[i] for i in indices if len(items) > i >= 0]
+    elif indices:
+        items = [items[i] for i in indices]
 
     Stack.store.save_items(topic, items)
 
@@ -371,10 +384,10 @@ def _handle_topics(new_item, indices, items, topic):
     if new_item:
         return helpdoc["topics"]
 
-    if not indices:
+    if indices is None:
         indices = range(len(items))
 
-    return output([(i + 1, items[i]) for i in indices if len(items) > i >= 0])
+    return output([(i + 1, items[i]) for i in indices])
 
 
 _handle_list = _handle_topics
@@ -388,20 +401,25 @@ def _handle_other(new_item, indices, items, topic):
     return helpdoc["stack"]
 
 
+# `topic[index] item`, where the topic has no spaces and the index
+# extends to the last closing bracket.
+_PARAMS_RE = re.compile(r'(?P<topic>[^\[ ]*)\[(?P<index>.*)\](?P<item>.*)', re.DOTALL)
+
+
 def _parse_params(params, default_topic):
-    start = params.find("[")
-    finish = params.rfind("]")
-    sp = params.find(" ")
-    if start != -1 and finish != -1 and start < finish and (sp == -1 or start < sp):
-        topic, index = (atom.strip() for atom in params[:finish].split("[", 1))
-        if not topic:
-            topic = default_topic
-        new_item = params[finish + 1 :].strip()
-    else:
-        topic = default_topic
-        index = None
-        new_item = params.strip()
-    return index, new_item, topic
+    """
+    >>> _parse_params('work[1, "a]"] item [x]', 'nick')
+    ('1, "a]"] item [x', '', 'work')
+    >>> _parse_params('[-1] item', 'nick')
+    ('-1', 'item', 'nick')
+    >>> _parse_params('an item [1]', 'nick')
+    (None, 'an item [1]', 'nick')
+    """
+    match = _PARAMS_RE.fullmatch(params)
+    if not match:
+        return None, params.strip(), default_topic
+    topic = match.group('topic').strip() or default_topic
+    return match.group('index').strip(), match.group('item').strip(), topic
 
 
 def _parse_stack_command(text):
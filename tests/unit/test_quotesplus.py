@@ -0,0 +1,212 @@
+import functools
+import sqlite3
+
+import pytest
+
+from pmxbot import logging, quotesplus
+
+
+@pytest.fixture
+def sqlite_quotes(tmpdir):
+    uri = f'sqlite://{tmpdir / "db.sqlite"}'
+    logger = logging.Logger.from_URI(uri)
+    logger.message('#test', 'testrunner', 'some text')
+    logger.close()
+    q = quotesplus.QuotesPlus.from_URI(uri)
+    try:
+        yield q
+    finally:
+        q.close()
+
+
+def test_SQLiteQuotesPlus(sqlite_quotes):
+    q = sqlite_quotes
+
+    q.add('album', 'who would ever say such a thing')
+    q.add('album', 'go ahead, take my pay')
+    q.add('album', "let's do the Time Warp again")
+    q.add('band', 'The Time Warps')
+    qt, i, n = q.lookup('album', 'time warp')
+    assert qt.startswith("let's")
+    assert (i, n) == (1, 1)
+    assert q.lookup('band', 'time warp') == ('The Time Warps', 1, 1)
+    assert q.lookup('album', 'nonexistent') == ('', 1, 0)
+    assert q.lookup('album', 'time warp 1')[0].startswith("let's")
+    assert q.lookup('album')[2] == 3
+
+
+def test_SQLiteQuotesPlus_lookup_by_number(sqlite_quotes):
+    q = sqlite_quotes
+
+    q.add('album', "let's do the Time Warp again")
+    q.add('album', 'the end')
+    assert q.lookup('album', 'the 2') == ('the end', 2, 2)
+    assert q.lookup('album', 'the 1')[1:] == (1, 2)
+
+
+def test_SQLiteQuotesPlus_lookup_syntax(sqlite_quotes):
+    q = sqlite_quotes
+
+    q.add('album', 'say "hi" to everyone')
+    assert q.lookup('album', '"hi"')[0] == 'say "hi" to everyone'
+    assert q.lookup('album', 'hi" OR "bye')[0] == ''
+
+
+def test_SQLiteQuotesPlus_random_lookup_position(sqlite_quotes):
+    q = sqlite_quotes
+
+    for n in range(5):
+        q.add('album', f'track {n}')
+    for _ in range(10):
+        qt, i, n = q.lookup('album', 'track')
+        assert n == 5
+        assert q.lookup('album', f'track {i}')[0] == qt
+
+
+def test_quote_command(sqlite_quotes, monkeypatch):
+    monkeypatch.setattr(quotesplus.QuotesPlus, 'store', sqlite_quotes, raising=False)
+
+    assert quotesplus.quote_command('album', 'add: drivers: only work') == (
+        'album added!'
+    )
+    assert quotesplus.quote_command('album', 'add some text') == 'album added!'
+    assert quotesplus.quote_command('album', 'drivers') == (
+        '(1/1): drivers: only work'
+    )
+    assert quotesplus.quote_command('album', 'nonexistent') is None
+    assert quotesplus.quote_command('band', 'drivers') is None
+
+    assert quotesplus.quote_command('album', 'del: drivers') == (
+        'Deleted the sole album that matched'
+    )
+    assert quotesplus.quote_command('album', 'drivers') is None
+    assert quotesplus.quote_command('album', 'some text') == '(1/1): some text'
+
+
+def test_SQLiteQuotesPlus_delete(sqlite_quotes):
+    q = sqlite_quotes
+
+    q.add('album', 'track one')
+    q.add('album', 'track two')
+    q.add('band', 'track one')
+    with pytest.raises(ValueError):
+        q.delete('album', 'track')
+    with pytest.raises(ValueError):
+        q.delete('album', 'nonexistent')
+    with pytest.raises(IndexError):
+        q.delete('album', 'track 3')
+    q.delete('album', 'track 2')
+    assert q.lookup('album', 'track') == ('track one', 1, 1)
+    q.delete('album', 'one')
+    assert q.lookup('album', 'track')[2] == 0
+    assert q.lookup('band', 'track') == ('track one', 1, 1)
+
+
+def test_SQLiteQuotesPlus_lookup_word_prefix(sqlite_quotes):
+    q = sqlite_quotes
+
+    q.add('band', 'The Time Warps')
+    assert q.lookup('band', 'tim warp')[0] == 'The Time Warps'
+    # words match the start of a token, not arbitrary substrings
+    assert q.lookup('band', 'arp')[0] == ''
+
+
+def test_SQLiteQuotesPlus_lookup_punctuation(sqlite_quotes):
+    q = sqlite_quotes
+
+    q.add('album', 'I love C++')
+    q.add('album', 'cafe society')
+    q.add('album', 'wow!!!')
+    q.add('album', 'smile :)')
+    assert q.lookup('album', '!!!') == ('wow!!!', 1, 1)
+    assert q.lookup('album', ':)') == ('smile :)', 1, 1)
+    assert q.lookup('album', '&') == ('', 1, 0)
+    assert q.lookup('album', 'c++') == ('I love C++', 1, 1)
+    assert q.lookup('album', 'c')[2] == 2
+    # punctuation alongside words doesn't narrow the search
+    assert q.lookup('album', 'smile :)') == ('smile :)', 1, 1)
+    assert q.lookup('album', 'wow &') == ('wow!!!', 1, 1)
+
+
+def test_SQLiteQuotesPlus_indexes_existing_quotes(tmpdir):
+    path = tmpdir / 'db.sqlite'
+    db = sqlite3.connect(str(path))
+    db.execute(
+        'CREATE TABLE quotes '
+        '(quoteid INTEGER PRIMARY KEY, library VARCHAR NOT NULL, quote TEXT NOT NULL)'
+    )
+    db.execute("INSERT INTO quotes (library, quote) VALUES ('band', 'The Time Warps')")
+    db.commit()
+    db.close()
+
+    q = quotesplus.QuotesPlus.from_URI(f'sqlite://{path}')
+    try:
+        assert q.lookup('band', 'time warp') == ('The Time Warps', 1, 1)
+    finally:
+        q.close()
+
+
+@pytest.fixture
+def mongodb_quotes(mongodb_uri, monkeypatch):
+    # don't resolve legacy log ids against whatever logs are present
+    monkeypatch.setattr(logging.Logger, 'log_id_map', {}, raising=False)
+    q = quotesplus.QuotesPlus.from_URI(mongodb_uri)
+
+    clean = functools.partial(q.db.delete_many, dict(library='test'))
+    clean()
+    try:
+        yield q
+    finally:
+        clean()
+
+
+def test_MongoDBQuotes(mongodb_quotes):
+    q = mongodb_quotes
+
+    q.add('test', 'who would ever say such a thing')
+    q.add('test', 'go ahead, take my pay')
+    q.add('test', "let's do the Time Warp again")
+    qt, i, n = q.lookup('test', 'time warp')
+    assert qt.startswith("let's")
+    assert (i, n) == (1, 1)
+    assert q.lookup('test', 'nonexistent') == ('', 1, 0)
+    # the text index matches whole words only
+    assert q.lookup('test', 'tim')[0] == ''
+    q.delete('test', 'Time Warp')
+    assert q.lookup('test', 'Time Warp')[0] == ''
+
+
+def test_MongoDBQuotes_bulk_import(mongodb_quotes):
+    q = mongodb_quotes
+
+    q.bulk_import([
+        dict(library='test', text='first import', log_id=None),
+        dict(library='test', text='second import'),
+    ])
+    assert q.lookup('test', 'import')[2] == 2
+    (match,) = q.find_matches('test', 'second')
+    assert set(match) == {'_id', 'text'}
+
+
+def test_MongoDBQuotes_lookup_position(mongodb_quotes):
+    q = mongodb_quotes
+
+    for n in range(5):
+        q.add('test', f'track {n}')
+    assert q.lookup('test', 'track 2') == ('track 1', 2, 5)
+    assert q.lookup('test', 'track 9') == ('', 9, 5)
+    for _ in range(10):
+        qt, i, n = q.lookup('test', 'track')
+        assert n == 5
+        assert q.lookup('test', f'track {i}')[0] == qt
+
+
+def test_MongoDBQuotes_existing_text_index(mongodb_quotes, mongodb_uri):
+    coll = mongodb_quotes.db
+    coll.drop_indexes()
+    # a collection allows only one text index
+    coll.create_index([('text', 'text'), ('library', 'text')])
+    try:
+        quotesplus.QuotesPlus.from_URI(mongodb_uri).close()
+    finally:
+        coll.drop_indexes()
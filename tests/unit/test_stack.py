@@ -127,6 +127,13 @@ class TestStackPop(StackTestCase):
             "1: red | 2: yellow | 3: green | 4: blue | 5: indigo",
         )
 
+    def test_stack_pop_empty(self):
+        Stack.store = DummyStorage()
+
+        self.assertEqual(stack("fumanchu", "pop"), "(none popped)")
+        self.assertEqual(stack("fumanchu", "pop []"), "(none popped)")
+        self.assertEqual(stack("fumanchu", "show"), "(empty)")
+
     def test_stack_pop_integer_range(self):
         self.make_colors()
 
@@ -152,6 +159,19 @@ class TestStackPop(StackTestCase):
             "1: orange | 2: yellow | 3: blue | 4: indigo | 5: violet",
         )
 
+        self.assertEqual(stack("fumanchu", 'pop ["black"]'), "(none popped)")
+        self.assertEqual(
+            stack("fumanchu", "show"),
+            "1: orange | 2: yellow | 3: blue | 4: indigo | 5: violet",
+        )
+
+    def test_stack_pop_no_match(self):
+        self.make_colors()
+
+        self.assertEqual(stack("fumanchu", 'pop [,]'), "(none popped)")
+        self.assertEqual(stack("fumanchu", 'pop [/black/]'), "(none popped)")
+        self.assertEqual(len(Stack.store.table["fumanchu"]), 7)
+
     def test_stack_pop_regex(self):
         self.make_colors()
 
@@ -232,6 +252,14 @@ class TestStackShuffle(StackTestCase):
             "1: yellow | 2: green | 3: blue | 4: violet | 5: red",
         )
 
+    def test_stack_shuffle_no_match(self):
+        self.make_colors()
+        colors = list(Stack.store.table["fumanchu"])
+
+        for index in '[9]', '[0]', '["black"]':
+            stack("fumanchu", f"shuffle {index}")
+            self.assertEqual(Stack.store.table["fumanchu"], colors)
+
     def test_stack_shuffle_topic(self):
         self.make_colors()
 
@@ -262,6 +290,21 @@ class TestStackShow(StackTestCase):
         self.assertEqual(stack("fumanchu", 'show [0]'), "(empty)")
         self.assertEqual(stack("fumanchu", 'show [-1200]'), "(empty)")
 
+    def test_stack_show_no_match(self):
+        self.make_colors()
+
+        self.assertEqual(stack("fumanchu", 'show ["black"]'), "(empty)")
+        self.assertEqual(stack("fumanchu", 'show [3:1]'), "(empty)")
+        self.assertEqual(stack("fumanchu", 'show [,]'), "(empty)")
+
+    def test_stack_show_combined_index(self):
+        self.make_colors()
+
+        self.assertEqual(
+            stack("fumanchu", 'show [6, :2, "i"]'),
+            "6: indigo | 1: red | 2: orange | 7: violet",
+        )
+
     def test_stack_show_multiline(self):
         self.make_colors()
         stack("fumanchu", "add [//] a big thing to work on")
@@ -320,6 +363,7 @@ class TestStackTopics(StackTestCase):
         self.assertEqual(stack("fumanchu", 'topics [-1]'), "3: sarah")
         self.assertEqual(stack("fumanchu", 'topics [0]'), "(empty)")
         self.assertEqual(stack("fumanchu", 'topics [-1200]'), "(empty)")
+        self.assertEqual(stack("fumanchu", 'topics [/x/]'), "(empty)")
 
 
 class TestStackHelp(StackTestCase):
@@ -367,6 +411,22 @@ class TestSQLiteStack:
 
         assert s.get_topics() == []
 
+    def test_save_items_round_trip(self, sqlite_stack):
+        s = sqlite_stack
+        s.save_items('foo', ['a', 'b', 'c'])
+        s.save_items('bar', ['x'])
+
+        s.save_items('foo', ['a', 'B', 'c', 'd'])
+        assert s.get_items('foo') == ['a', 'B', 'c', 'd']
+
+        s.save_items('foo', ['b'])
+        assert s.get_items('foo') == ['b']
+        assert s.get_items('bar') == ['x']
+
+        s.save_items('baz', [])
+        assert s.get_items('baz') == []
+        assert sorted(s.get_topics()) == ['bar', 'foo']
+
 
 class TestMongoDBStack:
     @pytest.fixture